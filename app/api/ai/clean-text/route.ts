@@ -1,67 +1,54 @@
 import { google } from '@ai-sdk/google';
-import { generateText } from 'ai';
+import { generateObject } from 'ai';
 import { NextResponse } from 'next/server';
+import { z } from 'zod';
+
+// Declarative rules applied by app/api/py/text_cleanup.py
+const cleanupRulesSchema = z.object({
+  drop_patterns: z.array(z.string()).describe("Regex (sintaxis Python) de líneas a eliminar"),
+  strip_blocks: z.array(z.object({
+    start: z.string().describe("Regex de la primera línea del bloque"),
+    end: z.string().describe("Regex de la última línea del bloque"),
+  })).describe("Bloques a eliminar, desde la línea inicial hasta la final (inclusive)"),
+  collapse_whitespace: z.boolean().describe("Elimina espacios al final de línea y líneas vacías repetidas"),
+});
 
 export async function POST(req: Request) {
   try {
     const { feedback, textSample } = await req.json();
 
     const prompt = `
-Eres un experto en procesamiento de texto con Python.
-Tu tarea es generar un script de Python que limpie un archivo de texto según las instrucciones del usuario.
+Eres un experto en procesamiento de texto y expresiones regulares.
+Tu tarea es definir reglas de limpieza declarativas para un archivo de texto según las instrucciones del usuario.
 
 INSTRUCCIONES DEL USUARIO: "${feedback}"
 
 FORMATO DEL ARCHIVO:
 El archivo tiene secciones como [ESTRUCTURA_TABULAR...] y [TEXTO_RAW...].
-Debes procesar TODO el archivo, pero enfócate en cumplir lo que el usuario pide. Generalmente querrán eliminar líneas que contienen ciertos patrones o frases.
+Las reglas se aplican a TODO el archivo, línea por línea. Las líneas "--- PÁGINA N ---" nunca se eliminan.
 
-REQUISITOS DEL SCRIPT:
-1. El script lee de un archivo 'input.txt' y escribe en 'output.txt'.
-2. Usa solo librerías estándar (re, sys, os).
-3. Debe ser MUY PRECISO: solo elimina líneas que coincidan con la instrucción exacta del usuario. Si la línea contiene una fecha y un monto, NO la elimines a menos que la instrucción sea explícita.
-4. Conserva el formato original (espacios y tabulaciones) de las líneas que no se eliminan.
-5. No incluyas explicaciones, solo el código Python funcional.
+REGLAS DISPONIBLES:
+1. drop_patterns: expresiones regulares (Python, sin distinción de mayúsculas); se elimina cada línea que coincida.
+2. strip_blocks: pares start/end; se elimina desde la línea que coincide con start hasta la que coincide con end (inclusive).
+3. collapse_whitespace: true para eliminar espacios finales y líneas vacías repetidas.
 
-EJEMPLO DE ESTRUCTURA DEL SCRIPT:
-\`\`\`python
-import re
-import sys
-
-def clean():
-    try:
-        with open('input.txt', 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-        
-        cleaned_lines = []
-        for line in lines:
-            # Lógica de filtrado basada en la instrucción: "${feedback}"
-            if not re.search(r'...', line, re.I):
-                cleaned_lines.append(line)
-        
-        with open('output.txt', 'w', encoding='utf-8') as f:
-            f.writelines(cleaned_lines)
-    except Exception as e:
-        print(f"Error: {e}")
-        sys.exit(1)
-
-if __name__ == "__main__":
-    clean()
-\`\`\`
+REQUISITOS:
+1. Debes ser MUY PRECISO: solo elimina líneas que coincidan con la instrucción exacta del usuario. Si la línea contiene una fecha y un monto, NO la elimines a menos que la instrucción sea explícita.
+2. Prefiere patrones anclados (^...) y específicos. Evita cuantificadores anidados como (a+)+.
+3. Deja las listas vacías si no aplican.
 
 TEXTO DE MUESTRA (Primeros 2000 caracteres):
 ${textSample.substring(0, 2000)}
 `;
 
-    const { text: pythonCode } = await generateText({
+    const { object: rules } = await generateObject({
       model: google('gemini-2.5-flash'),
+      schema: cleanupRulesSchema,
       prompt: prompt,
+      temperature: 0.1,
     });
 
-    // Extract code block if AI included backticks
-    const cleanCode = pythonCode.replace(/```python|```/g, '').trim();
-
-    return NextResponse.json({ pythonCode: cleanCode });
+    return NextResponse.json({ rules });
   } catch (error: any) {
     return NextResponse.json({ error: error.message }, { status: 500 });
   }
@@ -19,6 +19,9 @@ const pageTransactionSchema = z.object({
   })
 });
 
+// A unit of work sent to the model: one page, or several pages packed by compact extraction
+type TextChunk = { pages: number[]; text: string };
+
 // Split text into pages using the "--- PÁGINA X ---" marker
 function splitTextIntoPages(text: string): string[] {
   const pageMarkerRegex = /---\s*PÁGINA\s*\d+\s*---/gi;
@@ -26,6 +29,12 @@ function splitTextIntoPages(text: string): string[] {
   return parts.filter(p => p.trim().length > 100);
 }
 
+// "página 3" / "páginas 1, 2 y 3"
+function describePages(pages: number[]): string {
+  if (pages.length === 1) return `página ${pages[0]}`;
+  return `páginas ${pages.slice(0, -1).join(', ')} y ${pages[pages.length - 1]}`;
+}
+
 export async function POST(request: NextRequest) {
   const encoder = new TextEncoder();
   let isCancelled = false;
@@ -42,7 +51,7 @@ export async function POST(request: NextRequest) {
       };
 
       try {
-        const { text, sessionId, filePath, outputName } = await request.json();
+        const { text, chunks, sessionId, filePath, outputName } = await request.json();
 
         if (!text) {
           send({ step: 'error', message: 'No text provided' });
@@ -52,14 +61,21 @@ export async function POST(request: NextRequest) {
 
         // Split text into pages
         send({ step: 'split', status: 'running', message: 'Dividiendo documento en páginas...' });
-        const pages = splitTextIntoPages(text);
+        // Compact extraction already packs pages into token-budgeted chunks
+        const pages: TextChunk[] = Array.isArray(chunks) && chunks.length > 0
+          // Packed chunks may legitimately be short (the tail of an oversized page); only empty ones are skipped
+          ? chunks.filter((c: TextChunk) => c.text.replace(/---\s*PÁGINA\s*\d+\s*---/gi, '').trim().length > 0)
+          : splitTextIntoPages(text).map((pageText, i) => ({ pages: [i + 1], text: pageText }));
         const totalPages = pages.length || 1;
 
         if (pages.length === 0) {
-          pages.push(text);
+          pages.push({ pages: [1], text });
         }
 
-        send({ step: 'split', status: 'done', message: `Documento dividido en ${pages.length} página(s)` });
+        const pageCount = pages.reduce((n, chunk) => n + chunk.pages.length, 0);
+        send({ step: 'split', status: 'done', message: pageCount === pages.length
+          ? `Documento dividido en ${pages.length} página(s)`
+          : `${pageCount} páginas agrupadas en ${pages.length} bloque(s)` });
 
         // Process each page
         const allTransactions: Array<{ fecha: string; descripcion: string; valor: number; ignored: boolean }> = [];
@@ -69,9 +85,9 @@ export async function POST(request: NextRequest) {
         // Fetch existing banks for context
         const existingBanks = await getExistingBanks();
 
-        const prompt = (pageText: string, pageNum: number) => `
+        const prompt = (pageText: string, pageNums: number[]) => `
 Eres un experto en extracción de datos financieros.
-Tu misión: Analizar el texto de LA PÁGINA ${pageNum} de un extracto bancario y extraer TODAS las transacciones.
+Tu misión: Analizar el texto de ${pageNums.length > 1 ? 'LAS' : 'LA'} ${describePages(pageNums).toUpperCase()} de un extracto bancario y extraer TODAS las transacciones.
 
 REGLAS:
 1. **FECHA:** Formato YYYY-MM-DD. Si el año no está explícito, infiere del contexto.
@@ -90,21 +106,22 @@ ${existingBanks.length > 0 ? `Estos son los bancos ya registrados en el sistema:
 Si el extracto pertenece a uno de estos, USA ESE NOMBRE EXACTAMENTE.
 Si es un banco nuevo, extrae el nombre tal cual aparece.` : 'No hay bancos registrados aun.'}
 
-Si no hay transacciones en esta página, devuelve un array vacío.
-
---- TEXTO DE LA PÁGINA ${pageNum} ---
+Si no hay transacciones en ${pageNums.length > 1 ? 'estas páginas' : 'esta página'}, devuelve un array vacío.
+${pageNums.length > 1 ? 'Cada página empieza con su marcador "--- PÁGINA N ---"; extrae las transacciones de todas.\n' : ''}
+--- TEXTO DE ${pageNums.length > 1 ? 'LAS' : 'LA'} ${describePages(pageNums).toUpperCase()} ---
 ${pageText.substring(0, 25000)}
 --- FIN ---
 `;
 
         for (let i = 0; i < pages.length; i++) {
           if (isCancelled) {
-            send({ step: 'cancelled', message: `Cancelado en página ${i + 1} de ${pages.length}` });
+            send({ step: 'cancelled', message: `Cancelado en ${describePages(pages[i].pages)} (bloque ${i + 1} de ${pages.length})` });
             controller.close();
             return;
           }
 
           const pageNum = i + 1;
+          const label = describePages(pages[i].pages);
           const progress = Math.round((pageNum / totalPages) * 100);
 
           send({
@@ -112,15 +129,16 @@ ${pageText.substring(0, 25000)}
             status: 'running',
             currentPage: pageNum,
             totalPages,
+            pages: pages[i].pages,
             progress,
-            message: `Procesando página ${pageNum} de ${totalPages}...`
+            message: `Procesando ${label} (bloque ${pageNum} de ${totalPages})...`
           });
 
           try {
             const result = await generateObject({
               model: google('gemini-2.5-flash'),
               schema: pageTransactionSchema,
-              prompt: prompt(pages[i], pageNum),
+              prompt: prompt(pages[i].text, pages[i].pages),
               temperature: 0.1,
             });
 
@@ -144,7 +162,7 @@ ${pageText.substring(0, 25000)}
               currentPage: pageNum,
               totalPages,
               progress,
-              message: `Página ${pageNum}: ${pageTx.length} transacciones`,
+              message: `${label.charAt(0).toUpperCase()}${label.slice(1)}: ${pageTx.length} transacciones`,
               transactionsFound: pageTx.length
             });
 
@@ -156,7 +174,7 @@ ${pageText.substring(0, 25000)}
               currentPage: pageNum,
               totalPages,
               progress,
-              message: `Error en página ${pageNum}: ${err.message}`
+              message: `Error en ${label}: ${err.message}`
             });
           }
         }
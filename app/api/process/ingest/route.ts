@@ -0,0 +1,85 @@
+import { NextRequest } from 'next/server';
+import path from 'path';
+import fs from 'fs';
+import { getSourcePath, getRootDirTemp, getTemplatesDir } from '../lib/utils';
+import { ProcessorService } from '../services/processor.service';
+import { TransactionService } from '../services/transaction.service';
+
+// Bulk ingest of a folder or manifest of statements; ingest.py events are relayed as server-sent events
+export async function POST(request: NextRequest) {
+  const encoder = new TextEncoder();
+  const abort = new AbortController();
+
+  request.signal.addEventListener('abort', () => abort.abort());
+
+  const stream = new ReadableStream({
+    async start(controller) {
+      const send = (data: any) => {
+        if (abort.signal.aborted) return;
+        controller.enqueue(encoder.encode(`data: ${JSON.stringify(data)}\n\n`));
+      };
+
+      // ingest.py writes into a per-run temp folder; results are then saved like any processed file
+      const runDir = path.join(getRootDirTemp(), 'ingest', `${Date.now()}`);
+
+      try {
+        const { inputPath, template, passwords, workers } = await request.json();
+
+        if (!inputPath) {
+          send({ event: 'error', error: 'Missing inputPath' });
+          return;
+        }
+        // Without a template the product is plain text, which the dashboard does not read
+        if (!template) {
+          send({ event: 'error', error: 'Missing template' });
+          return;
+        }
+
+        // Templates are referenced by name from the templates folder
+        const templatePath = path.join(getTemplatesDir(), `${path.basename(template, '.json')}.json`);
+
+        // Saves are chained so concurrent results never pick the same numbered name
+        let saving = Promise.resolve();
+        const onEvent = (event: any) => {
+          // The summary is sent once every result has been saved
+          if (event.event === 'summary') return;
+          if (event.event !== 'done') return send(event);
+          saving = saving.then(async () => {
+            try {
+              const data = JSON.parse(await fs.promises.readFile(event.output, 'utf-8'));
+              const saved = await TransactionService.saveToBankFolder(data);
+              await fs.promises.unlink(event.output);
+              send({ ...event, output: saved });
+            } catch (err: any) {
+              send({ event: 'failed', file: event.file, stage: 'save', error: err.message });
+            }
+          });
+        };
+
+        const summary = await ProcessorService.ingest(getSourcePath(inputPath), path.join(runDir, 'output'), onEvent, {
+          templatePath,
+          passwords,
+          workers,
+          workDir: path.join(runDir, 'work'),
+          passwordRequiredDir: path.join(getRootDirTemp(), 'password-required'),
+          signal: abort.signal,
+        });
+        await saving;
+        send(summary);
+      } catch (error: any) {
+        send({ event: 'error', error: error.message });
+      } finally {
+        await fs.promises.rm(runDir, { recursive: true, force: true }).catch(() => { });
+        controller.close();
+      }
+    }
+  });
+
+  return new Response(stream, {
+    headers: {
+      'Content-Type': 'text/event-stream',
+      'Cache-Control': 'no-cache',
+      'Connection': 'keep-alive',
+    },
+  });
+}
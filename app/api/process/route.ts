@@ -54,8 +54,8 @@ export async function POST(request: Request) {
     // -- Action: AI Extract (Now only extracts text) --
     if (action === 'ai_extract') {
       try {
-        const { text } = await ProcessorService.extractText(sourcePath, password, sessionId);
-        return NextResponse.json({ success: true, text });
+        const { text, chunks, tokens } = await ProcessorService.extractText(sourcePath, password, sessionId, undefined, { compact: body.compact ?? true, tokenBudget: body.tokenBudget });
+        return NextResponse.json({ success: true, text, chunks, tokens });
       } catch (err: any) {
         if (err.message === 'PASSWORD_REQUIRED') return NextResponse.json({ error: 'PASSWORD_REQUIRED' }, { status: 401 });
         throw err;
@@ -1,10 +1,9 @@
 import fs from 'fs';
-import path from 'path';
-import { exec } from 'child_process';
+import { execFile } from 'child_process';
 import { promisify } from 'util';
-import { getPythonPath } from '../lib/utils';
+import { getPythonPath, getScriptPath } from '../lib/utils';
 
-const execAsync = promisify(exec);
+const execFileAsync = promisify(execFile);
 
 export class CleanupService {
   /**
@@ -22,54 +21,38 @@ export class CleanupService {
   }
 
   /**
-   * Aplica la limpieza al archivo TXT usando IA.
+   * Aplica la limpieza al archivo TXT usando reglas declarativas generadas por IA.
+   * Si se indica un template, las reglas se guardan en su `cleanup_rules` para reutilizarlas.
    */
-  static async applyCleanup(txtPath: string, instruction: string) {
+  static async applyCleanup(txtPath: string, instruction: string, templatePath?: string) {
     console.log(`[CleanupService] Planning cleanup for: ${instruction}`);
 
     // 1. Obtener muestra del texto
     const textSample = await fs.promises.readFile(txtPath, 'utf-8');
 
-    // 2. Llamar a la IA para generar el script
+    // 2. Llamar a la IA para generar las reglas
     const response = await fetch(`${process.env.NEXT_PUBLIC_BASE_URL || 'http://localhost:3000'}/api/ai/clean-text`, {
       method: 'POST',
       headers: { 'Content-Type': 'application/json' },
       body: JSON.stringify({ feedback: instruction, textSample: textSample.substring(0, 5000) }),
     });
 
-    if (!response.ok) throw new Error('Error al generar el script de limpieza con IA');
-    const { pythonCode } = await response.json();
+    if (!response.ok) throw new Error('Error al generar las reglas de limpieza con IA');
+    const { rules } = await response.json();
 
-    // 3. Guardar script temporal
-    const tempScriptPath = path.join(path.dirname(txtPath), `cleaner_${Date.now()}.py`);
-    const inputPath = txtPath;
-    const outputPath = path.join(path.dirname(txtPath), `cleaned_${path.basename(txtPath)}`);
+    // 3. Aplicar las reglas en una sola pasada (el archivo se reescribe en su lugar)
+    // execFile avoids shell quoting of the regexes in the rules
+    const args = [getScriptPath('text_cleanup.py'), '--input', txtPath, '--rules', JSON.stringify(rules)];
+    if (templatePath) args.push('--template', templatePath, '--save-to-template');
 
-    // Modificamos el código para que apunte a las rutas absolutas reales
-    const finalCode = pythonCode
-      .replace("'input.txt'", `r'${inputPath}'`)
-      .replace("'output.txt'", `r'${outputPath}'`);
-
-    await fs.promises.writeFile(tempScriptPath, finalCode, 'utf-8');
-
-    // 4. Ejecutar script
     try {
-      console.log(`[CleanupService] Executing cleaner script: ${tempScriptPath}`);
-      await execAsync(`"${getPythonPath()}" "${tempScriptPath}"`);
-
-      // 5. Reemplazar original con el limpio
-      if (fs.existsSync(outputPath)) {
-        await fs.promises.copyFile(outputPath, txtPath);
-        await fs.promises.unlink(outputPath);
-      }
+      console.log(`[CleanupService] Applying cleanup rules to: ${txtPath}`);
+      await execFileAsync(getPythonPath(), args);
     } catch (err: any) {
-      console.error('[CleanupService] Error executing cleanup script:', err);
+      console.error('[CleanupService] Error applying cleanup rules:', err);
       throw new Error(`Error ejecutando limpieza: ${err.message}`);
-    } finally {
-      // Limpiar script temporal
-      if (fs.existsSync(tempScriptPath)) {
-        await fs.promises.unlink(tempScriptPath);
-      }
     }
+
+    return rules;
   }
 }
@@ -1,4 +1,4 @@
-import { exec } from 'child_process';
+import { exec, spawn } from 'child_process';
 import { promisify } from 'util';
 import fs from 'fs';
 import path from 'path';
@@ -7,17 +7,26 @@ import { getPythonPath, getScriptPath, getTempDir } from '../lib/utils';
 const execAsync = promisify(exec);
 
 export class ProcessorService {
-  static async extractText(sourcePath: string, password?: string, sessionId?: string) {
+  static async extractText(sourcePath: string, password?: string, sessionId?: string, templatePath?: string, options: { compact?: boolean, tokenBudget?: number } = {}) {
     const prefix = sessionId ? `session_${sessionId}_` : '';
     const tempTxtPath = path.join(getTempDir(), `${prefix}${path.basename(sourcePath)}.txt`);
+    const chunksPath = `${tempTxtPath}.chunks.json`;
     await fs.promises.mkdir(path.dirname(tempTxtPath), { recursive: true });
 
     let cmd = `"${getPythonPath()}" "${getScriptPath('extract_text.py')}" --input "${sourcePath}" --output "${tempTxtPath}"`;
     if (password) cmd += ` --password "${password}"`;
+    if (templatePath) cmd += ` --template "${templatePath}"`;
+    if (options.compact) cmd += ` --compact --chunks-output "${chunksPath}"`;
+    if (options.compact && options.tokenBudget) cmd += ` --token-budget ${options.tokenBudget}`;
 
     try {
       await execAsync(cmd);
       const text = await fs.promises.readFile(tempTxtPath, 'utf-8');
+      if (options.compact) {
+        // Pages packed under the token budget, ready for /api/ai/normalize-pages
+        const report = JSON.parse(await fs.promises.readFile(chunksPath, 'utf-8'));
+        return { text, tempTxtPath, chunks: report.chunks.map((c: any) => ({ pages: c.pages, text: c.text })) as { pages: number[], text: string }[], tokens: report.pages };
+      }
       return { text, tempTxtPath };
     } catch (err: any) {
       if (err.code === 10 || (err.stderr && err.stderr.includes("PASSWORD_REQUIRED"))) {
@@ -31,7 +40,8 @@ export class ProcessorService {
     const cmd = `"${getPythonPath()}" "${getScriptPath('template_processor.py')}" --text "${textPath}" --template "${templatePath}"`;
     const { stdout } = await execAsync(cmd);
     const result = JSON.parse(stdout);
-    if (result.error) throw new Error(result.error);
+    // Partial results (a regex over its per-page budget) are returned with their error
+    if (result.error && !result.parcial) throw new Error(result.error);
     return result;
   }
 
@@ -71,4 +81,45 @@ export class ProcessorService {
       throw err;
     }
   }
+
+  static async ingest(inputPath: string, outputDir: string, onEvent: (event: any) => void, options: { templatePath?: string, passwords?: string[], workers?: number, passwordRequiredDir?: string, workDir?: string, signal?: AbortSignal } = {}) {
+    const args = [getScriptPath('ingest.py'), '--input', inputPath, '--output-dir', outputDir];
+    if (options.workDir) args.push('--work-dir', options.workDir);
+    if (options.templatePath) args.push('--template', options.templatePath);
+    if (options.workers) args.push('--workers', String(options.workers));
+    if (options.passwordRequiredDir) args.push('--password-required-dir', options.passwordRequiredDir);
+    (options.passwords || []).forEach(p => args.push('--password', p));
+
+    return new Promise<any>((resolve, reject) => {
+      const proc = spawn(getPythonPath(), args);
+      options.signal?.addEventListener('abort', () => proc.kill());
+      let buffer = '';
+      let summary: any = null;
+      let stderr = '';
+
+      // One JSON event per line (NDJSON)
+      proc.stdout.on('data', (data) => {
+        buffer += data.toString();
+        const lines = buffer.split('\n');
+        buffer = lines.pop() || '';
+        for (const line of lines) {
+          if (!line.trim()) continue;
+          try {
+            const event = JSON.parse(line);
+            if (event.event === 'summary') summary = event;
+            if (event.event === 'error') stderr = event.error;
+            onEvent(event);
+          } catch {
+            // Ignore non-JSON output
+          }
+        }
+      });
+      proc.stderr.on('data', (data) => { stderr += data.toString(); });
+
+      proc.on('close', (code) => {
+        if (summary) return resolve(summary);
+        reject(new Error(stderr || `Ingest exited with code ${code}`));
+      });
+    });
+  }
 }
@@ -5,6 +5,20 @@ import { getProcessedDir, getTempProcessedDir, getTempPreprocessedDir, getTempDi
 
 export class TransactionService {
   static async saveProcessedData(data: any, filePath: string, outputName?: string) {
+    const outputPath = await this.saveToBankFolder(data);
+
+    // Clear temp files after confirmed save
+    await this.clearTempProcessedData();
+
+    // Delete source file
+    const sourcePath = path.isAbsolute(filePath) ? filePath : path.join(process.cwd(), 'app', 'api', 'extracto', filePath);
+    try { await fs.promises.unlink(sourcePath); } catch (e) { }
+
+    return outputPath;
+  }
+
+  // Writes processed data as the next numbered file of its bank folder (processed/<bank>/<bank>-NN.json)
+  static async saveToBankFolder(data: any) {
     const processedDir = getProcessedDir();
 
     // Get bank name from data or use 'other'
@@ -45,14 +59,6 @@ export class TransactionService {
     }
 
     await fs.promises.writeFile(outputPath, JSON.stringify(data, null, 2));
-
-    // Clear temp files after confirmed save
-    await this.clearTempProcessedData();
-
-    // Delete source file
-    const sourcePath = path.isAbsolute(filePath) ? filePath : path.join(process.cwd(), 'app', 'api', 'extracto', filePath);
-    try { await fs.promises.unlink(sourcePath); } catch (e) { }
-
     return outputPath;
   }
 
@@ -0,0 +1,98 @@
+import argparse
+import builtins
+import io
+import sys
+import time
+
+_START = time.perf_counter()
+
+# Subcommand -> (module, description). Modules are imported only when their
+# subcommand runs, and heavy dependencies (pandas, pdfplumber, pikepdf) are
+# imported inside the functions that need them.
+COMMANDS = {
+    'extract-text': ('extract_text', 'Extractor Universal de Texto para Extractos'),
+    'extract-csv': ('extract_csv', 'Extractor de tablas PDF a CSV'),
+    'decrypt': ('decrypt_pdf', 'Decriptador de PDFs'),
+    'remove-password': ('remove_pdf_password', 'Remove PDF password protection'),
+    'process-template': ('template_processor', 'Procesador Universal de Templates'),
+    'inspect': ('inspect_pdf', 'Muestra el texto de cada página de un PDF'),
+    'infer-crop': ('crop_regions', 'Aprende la región de la tabla de transacciones de un extracto'),
+    'clean-text': ('text_cleanup', 'Limpieza declarativa de texto extraído'),
+    'ingest': ('ingest', 'Ingesta masiva de extractos (decriptar → extraer → template)'),
+}
+
+class ImportProfiler:
+    """Times first-time imports by wrapping __import__; nested imports count toward their top-level import."""
+
+    def __init__(self):
+        self.records = []
+        self._depth = 0
+        self._original_import = builtins.__import__
+
+    def __call__(self, name, globals=None, locals=None, fromlist=(), level=0):
+        is_new = level == 0 and name not in sys.modules
+        start = time.perf_counter()
+        self._depth += 1
+        try:
+            return self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            self._depth -= 1
+            if is_new and self._depth == 0:
+                self.records.append((name, time.perf_counter() - start))
+
+    def install(self):
+        builtins.__import__ = self
+        return self
+
+    def uninstall(self):
+        builtins.__import__ = self._original_import
+
+    def report(self, command):
+        total = sum(duration for _, duration in self.records)
+        lines = [f"[profile-imports] {command}: {len(self.records)} import(s), {total * 1000:.1f} ms"]
+        for name, duration in sorted(self.records, key=lambda r: r[1], reverse=True):
+            lines.append(f"  {duration * 1000:9.1f} ms  {name}")
+        lines.append(f"  total run time: {(time.perf_counter() - _START) * 1000:.1f} ms")
+        print("\n".join(lines), file=sys.stderr)
+
+def build_parser(command=None):
+    parser = argparse.ArgumentParser(description='SelfEconomy: herramientas de procesamiento de extractos')
+    parser.add_argument('--profile-imports', action='store_true', help='Reporta en stderr el tiempo de cada import')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    for name, (module_name, description) in COMMANDS.items():
+        subparser = subparsers.add_parser(name, help=description, description=description)
+        # Only the selected subcommand's module is imported (through __import__, so it is profiled)
+        if name == command:
+            module = __import__(module_name)
+            module.add_arguments(subparser)
+            subparser.set_defaults(run=module.run)
+
+    return parser
+
+def main(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+
+    # Force UTF-8 encoding for stdout on Windows
+    if sys.platform == 'win32' and (sys.stdout.encoding or '').lower() != 'utf-8':
+        sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+
+    # The flag belongs to the top-level parser, but the script shims put the
+    # subcommand first (`extract_text.py --profile-imports ...`), so move it ahead
+    profile = '--profile-imports' in argv
+    if profile:
+        argv = ['--profile-imports'] + [arg for arg in argv if arg != '--profile-imports']
+
+    profiler = ImportProfiler().install() if profile else None
+    command = next((arg for arg in argv if arg in COMMANDS), None)
+
+    try:
+        args = build_parser(command).parse_args(argv)
+        args.run(args)
+    finally:
+        if profiler:
+            profiler.uninstall()
+            profiler.report(command)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import math
+import re
+
+PAGE_MARKER = re.compile(r'^---\s*PÁGINA\s*(\d+)\s*---\s*$', re.MULTILINE | re.IGNORECASE)
+
+# Rough average for LLM tokenizers on mixed Spanish text and numbers
+CHARS_PER_TOKEN = 4
+DEFAULT_TOKEN_BUDGET = 6000
+
+def estimate_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def _norm(line):
+    return re.sub(r'\s+', ' ', line).strip().lower()
+
+def _edge_lines(lines, edge):
+    content = [l for l in lines if l.strip()]
+    return content[:edge] + content[-edge:]
+
+def find_repeated_edge_lines(pages, edge=3):
+    """
+    Returns the normalized lines that show up among the first/last `edge` lines of
+    at least half of the pages (and at least two): running headers and footers.
+    """
+    if len(pages) < 2:
+        return set()
+
+    counts = {}
+    for page in pages:
+        seen = {_norm(l) for l in _edge_lines(page['table_lines'], edge) + _edge_lines(page['raw_lines'], edge)}
+        for line in seen:
+            counts[line] = counts.get(line, 0) + 1
+
+    threshold = max(2, math.ceil(len(pages) / 2))
+    return {line for line, count in counts.items() if line and count >= threshold}
+
+def _is_covered(norm_line, table_rows, min_len=12):
+    """A raw line is covered when the table block already carries its text."""
+    if norm_line in table_rows:
+        return True
+    return len(norm_line) >= min_len and any(norm_line in row for row in table_rows)
+
+def compact_pages(pages, edge=3):
+    """
+    Compacts extracted PDF pages ({'table_lines': [...], 'raw_lines': [...]}) for the LLM:
+      - raw lines whose text is already in the page's table block are dropped
+      - running headers/footers are kept on the first page they appear and dropped after
+    Returns new page dicts; the input is not modified.
+    """
+    repeated = find_repeated_edge_lines(pages, edge)
+    already_emitted = set()
+    compacted = []
+
+    for page in pages:
+        table_lines = []
+        for line in page['table_lines']:
+            norm = _norm(line)
+            if norm in repeated:
+                if norm in already_emitted:
+                    continue
+                already_emitted.add(norm)
+            table_lines.append(line)
+
+        table_rows = {_norm(l) for l in table_lines if l.strip()}
+        raw_lines = []
+        for line in page['raw_lines']:
+            norm = _norm(line)
+            if not norm:
+                continue
+            if norm in repeated:
+                if norm in already_emitted:
+                    continue
+                already_emitted.add(norm)
+            elif _is_covered(norm, table_rows):
+                continue
+            raw_lines.append(line)
+
+        compacted.append({**page, 'table_lines': table_lines, 'raw_lines': raw_lines})
+
+    return compacted
+
+def split_pages(text):
+    """Splits extracted text on the page markers, keeping each marker with its page."""
+    starts = [m.start() for m in PAGE_MARKER.finditer(text)]
+    if not starts:
+        return [text] if text.strip() else []
+    return [text[start:end].strip('\n') for start, end in zip(starts, starts[1:] + [len(text)])]
+
+def _split_oversized(page_text, budget):
+    """Splits a page larger than the budget at line boundaries, repeating its marker on every piece."""
+    lines = page_text.split('\n')
+    marker = lines[0] if PAGE_MARKER.match(lines[0]) else None
+    body = lines[1:] if marker else lines
+
+    pieces, current = [], []
+    for line in body:
+        candidate = '\n'.join(([marker] if marker else []) + current + [line])
+        if current and estimate_tokens(candidate) > budget:
+            pieces.append('\n'.join(([marker] if marker else []) + current))
+            current = []
+        current.append(line)
+    if current:
+        pieces.append('\n'.join(([marker] if marker else []) + current))
+    return pieces
+
+def pack_pages(text, token_budget=DEFAULT_TOKEN_BUDGET):
+    """
+    Packs the pages of an extracted text into chunks of at most `token_budget`
+    estimated tokens. Pages are never reordered; a page that alone exceeds the
+    budget is split at line boundaries.
+    Returns {'pages': [{'page', 'tokens'}], 'chunks': [{'pages', 'tokens', 'text'}], ...}.
+    """
+    page_report = []
+    chunks = []
+    current_texts, current_pages = [], []
+
+    def flush():
+        if current_texts:
+            chunk_text = '\n\n'.join(current_texts)
+            chunks.append({'pages': list(current_pages), 'tokens': estimate_tokens(chunk_text), 'text': chunk_text})
+            current_texts.clear()
+            current_pages.clear()
+
+    for index, page_text in enumerate(split_pages(text)):
+        match = PAGE_MARKER.match(page_text)
+        page_num = int(match.group(1)) if match else index + 1
+        tokens = estimate_tokens(page_text)
+        page_report.append({'page': page_num, 'tokens': tokens})
+
+        pieces = [page_text] if tokens <= token_budget else _split_oversized(page_text, token_budget)
+        for piece in pieces:
+            candidate = '\n\n'.join(current_texts + [piece])
+            if current_texts and estimate_tokens(candidate) > token_budget:
+                flush()
+            current_texts.append(piece)
+            if page_num not in current_pages:
+                current_pages.append(page_num)
+    flush()
+
+    return {
+        'token_budget': token_budget,
+        'total_tokens': sum(p['tokens'] for p in page_report),
+        'pages': page_report,
+        'chunks': chunks,
+    }
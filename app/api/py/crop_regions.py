@@ -0,0 +1,209 @@
+import json
+import re
+import sys
+import os
+from script_utils import is_password_error, exit_password_required
+
+# A transaction row usually starts with a date and carries at least one amount
+DATE_PATTERN = re.compile(r'\b\d{1,2}[/\-.\s](\d{1,2}|[A-Za-z]{3})\b')
+AMOUNT_PATTERN = re.compile(r'\d[\d.,]*[.,]\d{2}\b')
+
+# Fraction of the page height, at the bottom, where a footer is expected
+FOOTER_ZONE = 0.15
+
+def get_crop_bbox(template, page_index):
+    """
+    Returns the learned bbox (x0, top, x1, bottom) for a page, or None.
+    Templates may store a single `crop_bbox` or `crop_regions` with
+    `first_page` / `continuation` boxes. Without a `continuation` box, later
+    pages are not cropped: the first page's box starts below its account header
+    and would cut rows near the top of the page.
+    """
+    if not template:
+        return None
+
+    regions = template.get('crop_regions') or {}
+    if regions:
+        if page_index == 0:
+            bbox = regions.get('first_page') or regions.get('continuation')
+        else:
+            bbox = regions.get('continuation')
+    else:
+        bbox = template.get('crop_bbox')
+
+    if not bbox or len(bbox) != 4:
+        return None
+    return tuple(float(v) for v in bbox)
+
+def is_transaction_line(text):
+    return bool(DATE_PATTERN.search(text) and AMOUNT_PATTERN.search(text))
+
+def count_rows_outside(page, bbox):
+    """Counts the lines that look like transactions and do not fit inside the bbox."""
+    x0, top, x1, bottom = bbox
+    return sum(
+        1 for line in page.extract_text_lines(return_chars=False)
+        if is_transaction_line(line['text']) and not (
+            top <= (line['top'] + line['bottom']) / 2 <= bottom and
+            x0 - 1 <= line['x0'] and line['x1'] <= x1 + 1
+        )
+    )
+
+def crop_page(page, bbox):
+    """
+    Crops the page to the bbox, clamped to the page bounds. Returns the page untouched if there is no bbox,
+    or, with a warning on stderr, when transaction-like lines do not fit inside the box (the region was
+    learned on a statement with a different layout).
+    """
+    if not bbox:
+        return page
+
+    px0, ptop, px1, pbottom = page.bbox
+    x0, top, x1, bottom = bbox
+    clamped = (max(x0, px0), max(top, ptop), min(x1, px1), min(bottom, pbottom))
+
+    # A box learned on a different page size may fall outside this page
+    if clamped[0] >= clamped[2] or clamped[1] >= clamped[3]:
+        return page
+
+    missed = count_rows_outside(page, clamped)
+    if missed:
+        print(
+            f"Advertencia: {missed} línea(s) con fecha y valor quedan fuera de la región de recorte "
+            f"en la página {page.page_number}; se usa la página completa. Vuelve a aprender las regiones con infer-crop.",
+            file=sys.stderr
+        )
+        return page
+    return page.crop(clamped)
+
+def load_template(template_path):
+    if not template_path:
+        return None
+    with open(template_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def _union(boxes):
+    if not boxes:
+        return None
+    return (
+        min(b[0] for b in boxes),
+        min(b[1] for b in boxes),
+        max(b[2] for b in boxes),
+        max(b[3] for b in boxes),
+    )
+
+def _table_extent(page, lines, rows_bbox, margin):
+    """
+    Stretches the box around the sample's transaction rows to the whole table area,
+    so longer statements still fit: up to the table header, down to the page
+    footer (or the bottom of the page when there is none), and across the page
+    width, since other statements may have wider descriptions or amounts.
+    """
+    px0, ptop, px1, pbottom = page.bbox
+    _, top, _, bottom = rows_bbox
+
+    # The line right above the first transaction is the table header; the
+    # margin above it never reaches the line before the header
+    above = [line for line in lines if line['bottom'] <= top]
+    header = max(above, key=lambda line: line['bottom'], default=None)
+    if header:
+        top = header['top']
+    previous = max((line['bottom'] + 1 for line in above if line['bottom'] <= top), default=ptop)
+    top = max(top - margin, previous)
+
+    # The lowest line counts as a footer only when it sits in the page's bottom margin
+    below = [line for line in lines if line['top'] >= bottom]
+    footer = max(below, key=lambda line: line['top'], default=None)
+    if footer and footer['top'] >= pbottom - (pbottom - ptop) * FOOTER_ZONE:
+        bottom = footer['top'] - 1
+    else:
+        bottom = pbottom
+
+    return [round(px0, 2), round(top, 2), round(px1, 2), round(bottom, 2)]
+
+def _pad(bbox, page, margin):
+    px0, ptop, px1, pbottom = page.bbox
+    x0, top, x1, bottom = bbox
+    return [
+        round(max(px0, x0 - margin), 2),
+        round(max(ptop, top - margin), 2),
+        round(min(px1, x1 + margin), 2),
+        round(min(pbottom, bottom + margin), 2),
+    ]
+
+def find_transaction_bbox(page, margin=15):
+    """
+    Locates the transaction table on a page: first by the lines that look like
+    transactions (date + amount), then by the tables pdfplumber detects.
+    """
+    lines = page.extract_text_lines(return_chars=False)
+    line_boxes = [
+        (line['x0'], line['top'], line['x1'], line['bottom'])
+        for line in lines
+        if is_transaction_line(line['text'])
+    ]
+    if line_boxes:
+        return _table_extent(page, lines, _union(line_boxes), margin)
+
+    tables = page.find_tables() or page.find_tables(table_settings={
+        "vertical_strategy": "text",
+        "horizontal_strategy": "text",
+        "snap_tolerance": 3,
+    })
+    bbox = _union([t.bbox for t in tables])
+    return _pad(bbox, page, margin) if bbox else None
+
+def infer_crop_regions(file_path, password=None, margin=15):
+    """Infers `crop_regions` (first page and continuation pages) from a sample statement."""
+    import pdfplumber
+
+    first_page = None
+    continuation_boxes = []
+
+    with pdfplumber.open(file_path, password=password) as pdf:
+        for i, page in enumerate(pdf.pages):
+            bbox = find_transaction_bbox(page, margin)
+            if not bbox:
+                continue
+            if i == 0:
+                first_page = bbox
+            else:
+                continuation_boxes.append(bbox)
+
+    continuation = _union(continuation_boxes)
+    regions = {}
+    if first_page:
+        regions['first_page'] = first_page
+    if continuation:
+        regions['continuation'] = list(continuation)
+    return regions
+
+def add_arguments(parser):
+    parser.add_argument('--input', type=str, required=True, help='Ruta al PDF de muestra')
+    parser.add_argument('--password', type=str, help='Contraseña del PDF')
+    parser.add_argument('--template', type=str, help='Ruta al template JSON donde guardar las regiones')
+    parser.add_argument('--margin', type=float, default=15, help='Margen en puntos alrededor de la tabla')
+
+def run(args):
+    try:
+        regions = infer_crop_regions(args.input, args.password, args.margin)
+        if not regions:
+            raise Exception("No se encontró una tabla de transacciones en el PDF")
+
+        if args.template:
+            template = load_template(args.template) if os.path.exists(args.template) else {}
+            template['crop_regions'] = regions
+            with open(args.template, 'w', encoding='utf-8') as f:
+                json.dump(template, f, indent=2, ensure_ascii=False)
+
+        print(json.dumps({"crop_regions": regions}, indent=2))
+
+    except Exception as e:
+        if is_password_error(e):
+            exit_password_required()
+        print(json.dumps({"error": str(e)}))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    from cli import main
+    main(['infer-crop', *sys.argv[1:]])
@@ -1,21 +1,26 @@
-import pdfplumber
-import pandas as pd
+import csv
+import io
 import sys
 import os
-import argparse
+from crop_regions import get_crop_bbox, crop_page, load_template
+from script_utils import is_password_error, exit_password_required, write_output
 
-def extract_csv_from_pdf(file_path, password=None):
+def extract_csv_from_pdf(file_path, password=None, template=None):
     """
     Extracts ALL data from PDF using multiple strategies:
     1. Table extraction for structured data
     2. Text extraction for non-tabular content
     Combines both approaches for maximum data capture.
     """
+    import pdfplumber
+
     all_rows = []
     
     try:
         with pdfplumber.open(file_path, password=password) as pdf:
             for page_num, page in enumerate(pdf.pages):
+                page = crop_page(page, get_crop_bbox(template, page_num))
+
                 # Add page separator
                 all_rows.append([f"--- PÁGINA {page_num + 1} ---", "", "", "", ""])
                 
@@ -70,19 +75,8 @@ def extract_csv_from_pdf(file_path, password=None):
                                     all_rows.append([line])
                                     
     except Exception as e:
-        error_msg = str(e).lower()
-        error_type = type(e).__name__.lower()
-        
-        password_keywords = ["password", "encrypted", "decrypt", "pdfsyntax", "pdfpassword"]
-        is_password_error = (
-            any(keyword in error_msg for keyword in password_keywords) or
-            any(keyword in error_type for keyword in password_keywords) or
-            (error_msg.strip() == "" or error_msg.strip() == "none")
-        )
-        
-        if is_password_error:
-            print("PASSWORD_REQUIRED", file=sys.stderr)
-            sys.exit(10)
+        if is_password_error(e):
+            exit_password_required()
         
         raise Exception(f"Error extrayendo CSV de PDF: {str(e)}")
     
@@ -99,33 +93,35 @@ def extract_csv_from_pdf(file_path, password=None):
             row = row + [''] * (max_cols - len(row))
         normalized_rows.append(row)
     
-    # Convert to DataFrame and then to CSV
-    df = pd.DataFrame(normalized_rows)
-    return df.to_csv(index=False, header=False)
+    # The stdlib writer is enough for plain string rows; pandas is not needed here
+    output = io.StringIO()
+    csv.writer(output, lineterminator='\n').writerows(normalized_rows)
+    return output.getvalue()
 
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description='Extractor de tablas PDF a CSV')
+def add_arguments(parser):
     parser.add_argument('--input', type=str, required=True, help='Ruta al archivo PDF de entrada')
     parser.add_argument('--password', type=str, help='Contraseña para PDFs protegidos')
     parser.add_argument('--output', type=str, required=True, help='Ruta al archivo CSV de salida')
-    
-    args = parser.parse_args()
-    
+    parser.add_argument('--template', type=str, help='Template JSON con regiones de recorte (crop_regions)')
+
+def run(args):
     file_ext = os.path.splitext(args.input)[1].lower()
     
     try:
         if file_ext != '.pdf':
             raise Exception(f"Este script solo soporta archivos PDF, recibido: {file_ext}")
         
-        csv_content = extract_csv_from_pdf(args.input, args.password)
+        csv_content = extract_csv_from_pdf(args.input, args.password, load_template(args.template))
         
-        os.makedirs(os.path.dirname(args.output), exist_ok=True)
-        with open(args.output, "w", encoding="utf-8-sig") as f:  # utf-8-sig for Excel compatibility
-            f.write(csv_content)
+        write_output(args.output, csv_content, encoding="utf-8-sig")  # utf-8-sig for Excel compatibility
         
         print(f"Éxito: CSV extraído en {args.output}")
         
     except Exception as e:
         print(f"Error: {str(e)}")
         sys.exit(1)
+
+if __name__ == "__main__":
+    from cli import main
+    main(['extract-csv', *sys.argv[1:]])
@@ -1,15 +1,36 @@
-import pdfplumber
-import pandas as pd
 import json
 import sys
 import os
-import argparse
+from crop_regions import get_crop_bbox, crop_page, load_template
+from compact_text import compact_pages, pack_pages, DEFAULT_TOKEN_BUDGET
+from script_utils import is_password_error, exit_password_required, write_output
 
-def extract_text_from_pdf(file_path, password=None):
-    text_content = []
+def format_pdf_page(page, compact=False):
+    page_output = [f"--- PÁGINA {page['page']} ---"]
+    table_text = "".join(line + "\n" for line in page['table_lines'])
+
+    if table_text.strip():
+        page_output.append("[ESTRUCTURA_TABULAR_CON_DESCRIPCIONES_COMPLETAS]")
+        page_output.append("💡 Este bloque es el más preciso. Usa \\s{5,} como separador de columnas.")
+        page_output.append(table_text)
+
+    # In compact mode a raw block fully covered by the table is left out
+    if not compact or page['raw_lines']:
+        page_output.append("[TEXTO_RAW_SIN_PROCESAR]")
+        page_output.append("\n".join(page['raw_lines']))
+
+    return "\n".join(page_output)
+
+def extract_text_from_pdf(file_path, password=None, template=None, compact=False):
+    import pdfplumber
+
+    pages = []
     try:
         with pdfplumber.open(file_path, password=password) as pdf:
             for i, page in enumerate(pdf.pages):
+                # Restrict layout analysis to the template's learned table region, if any
+                page = crop_page(page, get_crop_bbox(template, i))
+
                 # We want to ensure that descriptions spanning multiple lines are captured together.
                 # Table-based extraction is superior for bank statements as it preserves cell unity.
                 
@@ -24,7 +45,7 @@ def extract_text_from_pdf(file_path, password=None):
                 if not tables:
                     tables = page.extract_tables(table_settings=table_settings) # Strategy 2: Text alignment
                 
-                table_text = ""
+                table_lines = []
                 if tables:
                     for table in tables:
                         for row in table:
@@ -33,46 +54,28 @@ def extract_text_from_pdf(file_path, password=None):
                                 # This ensures that descriptions that span multiple lines in the PDF are captured as a single line.
                                 clean_row = [str(cell).replace('\n', ' ').strip() if cell else "" for cell in row]
                                 # We use a VERY wide separator (10 spaces) to distinguish structured columns from normal text flow.
-                                table_text += "          ".join(clean_row) + "\n"
-                        table_text += "\n"
+                                table_lines.append("          ".join(clean_row))
+                        table_lines.append("")
                 
                 # 2. Get the normal text for non-tabular data (headers, summaries, etc.)
                 raw_text = page.extract_text() or ""
                 
-                # 3. Combine both representations
-                page_output = [f"--- PÁGINA {i+1} ---"]
-                
-                if table_text.strip():
-                    page_output.append("[ESTRUCTURA_TABULAR_CON_DESCRIPCIONES_COMPLETAS]")
-                    page_output.append("💡 Este bloque es el más preciso. Usa \\s{5,} como separador de columnas.")
-                    page_output.append(table_text)
-                
-                page_output.append("[TEXTO_RAW_SIN_PROCESAR]")
-                page_output.append(raw_text)
-                
-                text_content.append("\n".join(page_output))
+                pages.append({'page': i + 1, 'table_lines': table_lines, 'raw_lines': raw_text.split("\n")})
                 
     except Exception as e:
-        error_msg = str(e).lower()
-        error_type = type(e).__name__.lower()
-        
-        # Check for password-related errors
-        password_keywords = ["password", "encrypted", "decrypt", "pdfsyntax", "pdfpassword"]
-        
-        is_password_error = (
-            any(keyword in error_msg for keyword in password_keywords) or
-            any(keyword in error_type for keyword in password_keywords) or
-            (error_msg.strip() == "" or error_msg.strip() == "none")
-        )
-        
-        if is_password_error:
-            print("PASSWORD_REQUIRED", file=sys.stderr)
-            sys.exit(10)
+        if is_password_error(e):
+            exit_password_required()
         
         raise Exception(f"Error extrayendo texto de PDF: {str(e)}")
-    return "\n\n".join(text_content)
+
+    # 3. Combine both representations
+    if compact:
+        pages = compact_pages(pages)
+    return "\n\n".join(format_pdf_page(page, compact) for page in pages)
 
 def extract_text_from_excel(file_path, rows_per_page=50):
+    import pandas as pd
+
     try:
         df = pd.read_excel(file_path)
         return split_dataframe_into_pages(df, rows_per_page)
@@ -100,6 +103,8 @@ def split_dataframe_into_pages(df, rows_per_page=50):
     return "\n\n".join(text_content)
 
 def extract_text_from_csv(file_path, rows_per_page=50):
+    import pandas as pd
+
     try:
         # Try different encodings
         for enc in ['utf-8', 'latin-1', 'cp1252']:
@@ -112,32 +117,41 @@ def extract_text_from_csv(file_path, rows_per_page=50):
     except Exception as e:
         raise Exception(f"Error extrayendo texto de CSV: {str(e)}")
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description='Extractor Universal de Texto para Extractos')
+def add_arguments(parser):
     parser.add_argument('--input', type=str, required=True, help='Ruta al archivo de entrada')
     parser.add_argument('--password', type=str, help='Contraseña para PDFs')
     parser.add_argument('--output', type=str, required=True, help='Ruta al archivo TXT de salida')
-    
-    args = parser.parse_args()
-    
+    parser.add_argument('--template', type=str, help='Template JSON con regiones de recorte (crop_regions)')
+    parser.add_argument('--compact', action='store_true', help='Elimina texto raw ya cubierto por la tabla y encabezados/pies repetidos')
+    parser.add_argument('--token-budget', type=int, default=DEFAULT_TOKEN_BUDGET, help='Tokens estimados máximos por bloque para la IA')
+    parser.add_argument('--chunks-output', type=str, help='Ruta al JSON con tokens por página y bloques empaquetados')
+
+def run(args):
     file_ext = os.path.splitext(args.input)[1].lower()
     
     try:
+        template = load_template(args.template)
         if file_ext == '.pdf':
-            text = extract_text_from_pdf(args.input, args.password)
+            text = extract_text_from_pdf(args.input, args.password, template, args.compact)
         elif file_ext in ['.xlsx', '.xls']:
             text = extract_text_from_excel(args.input)
         elif file_ext == '.csv':
             text = extract_text_from_csv(args.input)
         else:
             raise Exception(f"Extensión de archivo no soportada: {file_ext}")
-            
-        os.makedirs(os.path.dirname(args.output), exist_ok=True)
-        with open(args.output, "w", encoding="utf-8") as f:
-            f.write(text)
-            
+
+        write_output(args.output, text)
         print(f"Éxito: Texto extraído en {args.output}")
+
+        if args.chunks_output:
+            report = pack_pages(text, args.token_budget)
+            write_output(args.chunks_output, json.dumps(report, indent=2, ensure_ascii=False))
+            print(f"Tokens estimados: {report['total_tokens']} en {len(report['chunks'])} bloque(s)")
             
     except Exception as e:
         print(f"Error: {str(e)}")
         sys.exit(1)
+
+if __name__ == "__main__":
+    from cli import main
+    main(['extract-text', *sys.argv[1:]])
@@ -0,0 +1,345 @@
+import json
+import sys
+import os
+import io
+import time
+import shutil
+import contextlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from script_utils import PASSWORD_EXIT_CODE
+
+SUPPORTED_EXTENSIONS = ['.pdf', '.xlsx', '.xls', '.csv']
+
+class PasswordRequired(Exception):
+    pass
+
+class StageError(Exception):
+    pass
+
+@contextlib.contextmanager
+def _worker_io(warnings=None):
+    """
+    The extract/decrypt functions print progress to stdout and exit with code 10
+    on password errors. Inside a worker, stdout belongs to the NDJSON event stream,
+    so their output is captured and their exits become exceptions. On success,
+    what they wrote to stderr (e.g. crop warnings) is appended to `warnings`.
+    """
+    captured = io.StringIO()
+    captured_err = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(captured), contextlib.redirect_stderr(captured_err):
+            yield
+    except SystemExit as e:
+        if e.code == PASSWORD_EXIT_CODE:
+            raise PasswordRequired()
+        output = captured.getvalue() + captured_err.getvalue()
+        lines = [line for line in output.splitlines() if line.strip()]
+        raise StageError(lines[-1] if lines else f"El proceso terminó con código {e.code}")
+
+    if warnings is not None:
+        warnings.extend(line for line in captured_err.getvalue().splitlines() if line.strip())
+
+def _with_warnings(result, warnings):
+    if warnings:
+        result["warnings"] = warnings
+    return result
+
+# --- Stages (run inside the process pool) ---
+
+def stage_decrypt(input_path, output_path, passwords):
+    from decrypt_pdf import decrypt_pdf
+
+    for password in passwords or [None]:
+        warnings = []
+        try:
+            with _worker_io(warnings):
+                decrypt_pdf(input_path, output_path, password)
+            return _with_warnings({"path": output_path}, warnings)
+        except PasswordRequired:
+            continue
+    raise PasswordRequired()
+
+def stage_extract(input_path, output_path, template_path):
+    from extract_text import extract_text_from_pdf, extract_text_from_excel, extract_text_from_csv
+    from crop_regions import load_template
+
+    template = load_template(template_path)
+    file_ext = os.path.splitext(input_path)[1].lower()
+    warnings = []
+    with _worker_io(warnings):
+        if file_ext == '.pdf':
+            text = extract_text_from_pdf(input_path, None, template)
+        elif file_ext in ['.xlsx', '.xls']:
+            text = extract_text_from_excel(input_path)
+        else:
+            text = extract_text_from_csv(input_path)
+
+    # Template cleanup rules are applied once, by the template stage
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    return _with_warnings({"path": output_path, "chars": len(text)}, warnings)
+
+def stage_template(text_path, template_path, output_path):
+    from template_processor import process_with_template, build_result
+    from regex_guard import RegexBudgetExceeded
+
+    with open(template_path, 'r', encoding='utf-8') as f:
+        template = json.load(f)
+    with open(text_path, 'r', encoding='utf-8') as f:
+        raw_text = f.read()
+
+    # A regex over its time budget is deterministic, so retrying would not help:
+    # keep the partial result and report the error with it
+    error = None
+    try:
+        transactions = process_with_template(raw_text, template)
+        result = build_result(template, transactions)
+    except RegexBudgetExceeded as e:
+        transactions = e.transactions
+        error = str(e)
+        result = build_result(template, transactions)
+        result["error"] = error
+        result["parcial"] = True
+
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+
+    info = {"path": output_path, "transactions": len(transactions)}
+    if error:
+        info["error"] = error
+        info["partial"] = True
+    return info
+
+# --- Job planning ---
+
+def emit(event, **fields):
+    print(json.dumps({"event": event, "ts": round(time.time(), 3), **fields}, ensure_ascii=False), flush=True)
+
+def load_manifest(manifest_path):
+    """Reads a manifest: a JSON list, or JSONL / plain text with one entry per line."""
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        content = f.read()
+
+    if manifest_path.lower().endswith('.json'):
+        entries = json.loads(content)
+    else:
+        entries = []
+        for line in content.splitlines():
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            entries.append(json.loads(line) if line.startswith('{') else line)
+
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    jobs = []
+    for entry in entries:
+        if isinstance(entry, str):
+            entry = {"path": entry}
+        # Relative paths in a manifest are relative to the manifest itself
+        for key in ("path", "template"):
+            value = entry.get(key)
+            if value and not os.path.isabs(value):
+                entry[key] = os.path.join(base_dir, value)
+        jobs.append(entry)
+    return jobs
+
+def scan_directory(input_dir, recursive=False):
+    jobs = []
+    for root, dirs, files in os.walk(input_dir):
+        for name in sorted(files):
+            if os.path.splitext(name)[1].lower() in SUPPORTED_EXTENSIONS:
+                jobs.append({"path": os.path.join(root, name)})
+        if not recursive:
+            break
+    return jobs
+
+def _name_taken(name, used_names, output_dir):
+    """A name is taken by another file of the batch or by a result already in the output directory."""
+    return name in used_names or any(
+        os.path.exists(os.path.join(output_dir, f"{name}{ext}")) for ext in ('.json', '.txt')
+    )
+
+def plan_jobs(entries, args):
+    used_names = set()
+    jobs = []
+    for entry in entries:
+        base = entry.get("output_name") or os.path.splitext(os.path.basename(entry["path"]))[0]
+        name, n = base, 1
+        while _name_taken(name, used_names, args.output_dir):
+            n += 1
+            name = f"{base}_{n}"
+        used_names.add(name)
+
+        passwords = ([entry["password"]] if entry.get("password") else []) + (args.password or [])
+        template = entry.get("template") or args.template
+        jobs.append({
+            "file": entry["path"],
+            "name": name,
+            "passwords": passwords,
+            "template": template,
+            "current": entry["path"],
+            "stages": (['decrypt'] if entry["path"].lower().endswith('.pdf') else []) + ['extract'] + (['template'] if template else []),
+            "attempt": 0,
+            "started_at": None,
+            "intermediates": set(),
+        })
+    return jobs
+
+def remove_intermediates(job):
+    """Deletes the decrypted PDF / TXT a job wrote to the work directory."""
+    for path in job["intermediates"]:
+        if path != job["file"] and os.path.exists(path):
+            os.remove(path)
+
+def submit_stage(pool, job, args):
+    stage = job["stages"][0]
+    name = job["name"]
+    if stage == 'decrypt':
+        output_path = os.path.join(args.work_dir, f"{name}.pdf")
+        job["intermediates"].add(output_path)
+        return pool.submit(stage_decrypt, job["current"], output_path, job["passwords"])
+    if stage == 'extract':
+        # Without a template the extracted text is the final product
+        target_dir = args.work_dir if len(job["stages"]) > 1 else args.output_dir
+        output_path = os.path.join(target_dir, f"{name}.txt")
+        if target_dir == args.work_dir:
+            job["intermediates"].add(output_path)
+        return pool.submit(stage_extract, job["current"], output_path, job["template"])
+    return pool.submit(stage_template, job["current"], job["template"], os.path.join(args.output_dir, f"{name}.json"))
+
+# --- Pipeline ---
+
+def run_pipeline(jobs, args):
+    os.makedirs(args.output_dir, exist_ok=True)
+    os.makedirs(args.work_dir, exist_ok=True)
+
+    total = len(jobs)
+    for job in jobs:
+        emit("queued", file=job["file"], stages=job["stages"])
+
+    pending = deque(jobs)
+    running = {}
+    counts = {"done": 0, "failed": 0, "password_required": 0}
+    start = time.perf_counter()
+
+    def finish(job, status, **fields):
+        remove_intermediates(job)
+        counts[status] += 1
+        emit(status, file=job["file"], duration=round(time.perf_counter() - job["started_at"], 3), **fields)
+        finished = sum(counts.values())
+        elapsed = time.perf_counter() - start
+        emit("throughput", files_finished=finished, files_total=total, elapsed=round(elapsed, 3),
+             files_per_sec=round(finished / elapsed, 3) if elapsed else 0.0)
+
+    def handle(future, job, resubmit):
+        """Processes a finished stage; jobs with a stage left to run are appended to resubmit."""
+        stage = job["stages"][0]
+        try:
+            result = future.result()
+        except PasswordRequired:
+            routed_to = None
+            if args.password_required_dir:
+                os.makedirs(args.password_required_dir, exist_ok=True)
+                routed_to = shutil.copy2(job["file"], args.password_required_dir)
+            finish(job, "password_required", stage=stage, routed_to=routed_to)
+            return
+        except Exception as e:
+            # A dead worker (crash, out of memory) breaks the whole pool. Which file
+            # caused it is unknown, so every file that was running counts an attempt
+            # and is retried alone, so the others do not fail with the culprit again
+            broken = isinstance(e, BrokenProcessPool)
+            error = "Un proceso de trabajo terminó inesperadamente" if broken else str(e)
+            job["attempt"] += 1
+            if job["attempt"] <= args.retries:
+                emit("retry", file=job["file"], stage=stage, attempt=job["attempt"], error=error)
+                if broken:
+                    job["alone"] = True
+                    pending.appendleft(job)
+                else:
+                    resubmit.append(job)
+            else:
+                finish(job, "failed", stage=stage, error=error)
+            return
+
+        for warning in result.pop("warnings", []):
+            emit("warning", file=job["file"], stage=stage, message=warning)
+        emit("stage_done", file=job["file"], stage=stage, **result)
+        job["stages"].pop(0)
+        job["current"] = result["path"]
+        job["attempt"] = 0
+        if job["stages"]:
+            resubmit.append(job)
+        else:
+            finish(job, "done", output=result["path"])
+
+    pool = ProcessPoolExecutor(max_workers=args.workers)
+    try:
+        while pending or running:
+            # Only feed the pool as many files as it has workers, so "started" is real
+            while pending and len(running) < args.workers:
+                if running and (pending[0].get("alone") or any(j.get("alone") for j in running.values())):
+                    break
+                job = pending.popleft()
+                if job["started_at"] is None:
+                    job["started_at"] = time.perf_counter()
+                    emit("started", file=job["file"])
+                running[submit_stage(pool, job, args)] = job
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            broken = any(isinstance(future.exception(), BrokenProcessPool) for future in done)
+            if broken:
+                # Every future of a broken pool fails; collect them all before replacing it
+                done, _ = wait(running)
+
+            resubmit = []
+            for future in done:
+                handle(future, running.pop(future), resubmit)
+
+            if broken:
+                pool.shutdown(wait=False)
+                pool = ProcessPoolExecutor(max_workers=args.workers)
+            for job in resubmit:
+                running[submit_stage(pool, job, args)] = job
+    finally:
+        pool.shutdown()
+
+    elapsed = time.perf_counter() - start
+    emit("summary", files_total=total, elapsed=round(elapsed, 3), **counts)
+    return counts
+
+def add_arguments(parser):
+    parser.add_argument('--input', type=str, required=True, help='Directorio con extractos o manifiesto (.json, .jsonl, .txt)')
+    parser.add_argument('--output-dir', type=str, required=True, help='Directorio para los JSON procesados')
+    parser.add_argument('--work-dir', type=str, help='Directorio para archivos intermedios (PDF decriptado, TXT)')
+    parser.add_argument('--template', type=str, help='Template JSON por defecto para todos los archivos')
+    parser.add_argument('--password', type=str, action='append', help='Contraseña a probar (se puede repetir)')
+    parser.add_argument('--password-required-dir', type=str, help='Copia aquí los archivos que requieren contraseña')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Número de procesos en paralelo')
+    parser.add_argument('--retries', type=int, default=1, help='Reintentos por etapa ante errores')
+    parser.add_argument('--recursive', action='store_true', help='Recorre subdirectorios')
+
+def run(args):
+    args.workers = max(1, args.workers)
+    default_work_dir = not args.work_dir
+    args.work_dir = args.work_dir or os.path.join(args.output_dir, '_work')
+
+    try:
+        if os.path.isdir(args.input):
+            entries = scan_directory(args.input, args.recursive)
+        else:
+            entries = load_manifest(args.input)
+
+        counts = run_pipeline(plan_jobs(entries, args), args)
+        if default_work_dir and not os.listdir(args.work_dir):
+            os.rmdir(args.work_dir)
+        sys.exit(1 if counts["failed"] else 0)
+
+    except Exception as e:
+        emit("error", error=str(e))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    from cli import main
+    main(['ingest', *sys.argv[1:]])
@@ -1,7 +1,8 @@
-import pdfplumber
 import sys
 
 def inspect_pdf(file_path):
+    import pdfplumber
+
     try:
         with pdfplumber.open(file_path) as pdf:
             for i, page in enumerate(pdf.pages):
@@ -13,8 +14,15 @@ def inspect_pdf(file_path):
         print(f"Error reading PDF: {e}")
         traceback.print_exc()
 
+def add_arguments(parser):
+    parser.add_argument('input', type=str, help='Ruta al PDF')
+
+def run(args):
+    inspect_pdf(args.input)
+
 if __name__ == "__main__":
     if len(sys.argv) > 1:
-        inspect_pdf(sys.argv[1])
+        from cli import main
+        main(['inspect', *sys.argv[1:]])
     else:
         print("Please provide a PDF file path.")
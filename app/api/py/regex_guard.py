@@ -0,0 +1,310 @@
+import re
+
+try:
+    from re import _parser as sre_parse, _constants as sre_constants
+except ImportError:  # Python < 3.11
+    import sre_parse
+    import sre_constants
+
+DEFAULT_PAGE_BUDGET_MS = 2000
+
+REPEAT_OPS = {'MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT'}
+
+# Characters used to decide whether two single-character items can match the same input
+SAMPLE_CHARS = [chr(i) for i in range(256)]
+
+# `(x+)+`, `(?:x*)*`, ... where x is a single atom: the outer repeat adds nothing
+NESTED_SIMPLE_REPEAT = re.compile(
+    r'\((\?:)?(\\[A-Za-z.]|\[(?:\\.|[^\]\\])+\]|\.|[^()\\\[\]|?*+{}^$])([+*])\)([+*])'
+)
+
+class UnsafePatternError(Exception):
+    pass
+
+class RegexBudgetExceeded(Exception):
+    def __init__(self, label, pattern, page, budget_ms, transactions):
+        self.label = label
+        self.pattern = pattern
+        self.page = page
+        self.budget_ms = budget_ms
+        self.transactions = transactions
+        super().__init__(
+            f"El patrón {label} ({pattern}) excedió el presupuesto de {budget_ms} ms en la página {page}"
+        )
+
+# --- Static pre-check ---
+
+def _op_name(op):
+    return str(op)
+
+def _char_predicate(op, av):
+    """Returns a predicate for a single-character item, or None if it is not one."""
+    name = _op_name(op)
+    if name == 'LITERAL':
+        return lambda c: ord(c) == av
+    if name == 'NOT_LITERAL':
+        return lambda c: ord(c) != av
+    if name == 'ANY':
+        return lambda c: c != '\n'
+    if name == 'IN':
+        negate = any(_op_name(o) == 'NEGATE' for o, _ in av)
+        tests = []
+        for o, a in av:
+            o = _op_name(o)
+            if o == 'LITERAL':
+                tests.append(lambda c, a=a: ord(c) == a)
+            elif o == 'RANGE':
+                tests.append(lambda c, a=a: a[0] <= ord(c) <= a[1])
+            elif o == 'CATEGORY':
+                tests.append(_category_test(_op_name(a)))
+        return lambda c: any(t(c) for t in tests) != negate
+    return None
+
+def _category_test(category):
+    if 'DIGIT' in category:
+        base = str.isdigit
+    elif 'SPACE' in category:
+        base = str.isspace
+    elif 'WORD' in category:
+        base = lambda c: c.isalnum() or c == '_'
+    else:
+        base = lambda c: c in '\n\r'
+    if '_NOT_' in category:
+        return lambda c: not base(c)
+    return base
+
+def _overlaps(p1, p2):
+    return any(p1(c) and p2(c) for c in SAMPLE_CHARS)
+
+def _unwrap(items):
+    """Flattens plain groups so `((a)b)` is seen as the sequence a, b."""
+    flat = []
+    for op, av in items:
+        if _op_name(op) == 'SUBPATTERN':
+            flat.extend(_unwrap(list(av[-1])))
+        else:
+            flat.append((op, av))
+    return flat
+
+def _repeat_char_predicate(op, av):
+    """Predicate of `x+` / `x*` / `x{n,}` when x is a single character, else None."""
+    if _op_name(op) not in REPEAT_OPS:
+        return None
+    body = _unwrap(list(av[2]))
+    if len(body) != 1:
+        return None
+    return _char_predicate(*body[0])
+
+def _contains_unbounded_repeat(items):
+    """
+    Unbounded repeats inside lookarounds are not counted: a lookaround consumes
+    nothing, so the tempered token (?:(?!\\s{2,}).)+ still takes one character
+    per iteration. Lookarounds are still checked on their own by _find_issues.
+    """
+    for op, av in items:
+        name = _op_name(op)
+        if name in REPEAT_OPS and av[1] == sre_constants.MAXREPEAT:
+            return True
+        if name in ('ASSERT', 'ASSERT_NOT'):
+            continue
+        for child in _children(op, av):
+            if _contains_unbounded_repeat(child):
+                return True
+    return False
+
+def _children(op, av):
+    name = _op_name(op)
+    if name in REPEAT_OPS:
+        return [list(av[2])]
+    if name == 'SUBPATTERN':
+        return [list(av[-1])]
+    if name == 'BRANCH':
+        return [list(b) for b in av[1]]
+    if name in ('ASSERT', 'ASSERT_NOT'):
+        return [list(av[1])]
+    if name == 'ATOMIC_GROUP':
+        return [list(av)]
+    if name == 'GROUPREF_EXISTS':
+        return [list(b) for b in av[1:] if b]
+    return []
+
+def _first_char_predicate(items):
+    items = _unwrap(items)
+    if not items:
+        return None
+    op, av = items[0]
+    return _char_predicate(op, av) or _repeat_char_predicate(op, av)
+
+def _item_predicate(op, av):
+    """Predicate for the first character of a mandatory item: a single character or an alternation of known starts."""
+    if _op_name(op) == 'BRANCH':
+        starts = [_first_char_predicate(list(b)) for b in av[1]]
+        if not starts or not all(starts):
+            return None
+        return lambda c: any(p(c) for p in starts)
+    return _char_predicate(op, av)
+
+def _overlapping_branches(items):
+    """
+    Alternation whose branches can start with the same character: (a|ab)*.
+    The parser factors a shared prefix out of the branches, so (a|ab) and (a|a)
+    arrive as a(?:|b) and a(?:|); an empty branch is therefore ambiguous too.
+    """
+    for op, av in items:
+        if _op_name(op) == 'BRANCH':
+            if any(not list(b) for b in av[1]):
+                return True
+            known = [p for p in (_first_char_predicate(list(b)) for b in av[1]) if p]
+            for i in range(len(known)):
+                for j in range(i + 1, len(known)):
+                    if _overlaps(known[i], known[j]):
+                        return True
+    return False
+
+def _ambiguous_nested_repeat(items):
+    """
+    True when an unbounded repeat inside a repeated body lets consecutive
+    iterations split the same input in many ways: (a+)+, (\\w+\\s?)*, (.+,)+
+    """
+    inner = [i for i, (op, av) in enumerate(items) if _op_name(op) in REPEAT_OPS and av[1] == sre_constants.MAXREPEAT]
+    if not inner:
+        # Unbounded repeats hidden inside branches or lookarounds: be conservative
+        return True
+
+    for i in inner:
+        predicate = _repeat_char_predicate(*items[i])
+        if predicate is None:
+            return True
+
+        # Each iteration must contain a mandatory item the inner repeat cannot consume
+        separators = []
+        for j, (op, av) in enumerate(items):
+            if j == i:
+                continue
+            if _op_name(op) in REPEAT_OPS:
+                if av[0] >= 1:
+                    separators.append(_repeat_char_predicate(op, av))
+            else:
+                separators.append(_item_predicate(op, av))
+
+        if not any(sep and not _overlaps(predicate, sep) for sep in separators):
+            return True
+
+    return False
+
+def _find_issues(items):
+    issues = []
+    for op, av in items:
+        if _op_name(op) in REPEAT_OPS and av[1] > 1:
+            body = _unwrap(list(av[2]))
+            if _contains_unbounded_repeat(body) and _ambiguous_nested_repeat(body):
+                issues.append("cuantificador anidado ambiguo (p. ej. (a+)+ o (\\w+\\s?)*)")
+            elif av[1] == sre_constants.MAXREPEAT and _overlapping_branches(body):
+                issues.append("alternativas solapadas dentro de una repetición (p. ej. (a|ab)*)")
+        for child in _children(op, av):
+            issues.extend(_find_issues(child))
+    return issues
+
+def find_pathological_constructs(pattern):
+    """Returns human-readable descriptions of exponential-backtracking constructs in the pattern."""
+    parsed = sre_parse.parse(pattern)
+    return sorted(set(_find_issues(list(parsed))))
+
+def rewrite_pattern(pattern):
+    """Collapses redundant nested repeats of a single atom: (x+)+ -> (x+), (?:x*)+ -> (?:x*)."""
+    def collapse(m):
+        quantifier = '+' if m.group(3) == '+' and m.group(4) == '+' else '*'
+        return f"({m.group(1) or ''}{m.group(2)}{quantifier})"
+
+    previous = None
+    while previous != pattern:
+        previous = pattern
+        pattern = NESTED_SIMPLE_REPEAT.sub(collapse, pattern)
+    return pattern
+
+def check_pattern(pattern, label):
+    """
+    Validates a template pattern. Known exponential constructs are rewritten when
+    an equivalent safe form exists; otherwise UnsafePatternError is raised.
+    Returns the (possibly rewritten) pattern.
+    """
+    try:
+        issues = find_pathological_constructs(pattern)
+        if not issues:
+            return pattern
+
+        rewritten = rewrite_pattern(pattern)
+        if rewritten != pattern and not find_pathological_constructs(rewritten):
+            return rewritten
+    except re.error as e:
+        raise UnsafePatternError(f"El patrón {label} no es una expresión regular válida: {e}")
+
+    raise UnsafePatternError(f"El patrón {label} ({pattern}) fue rechazado: {', '.join(issues)}")
+
+# --- Per-page execution budget ---
+
+class PatternTracker:
+    """Holds the index of the pattern currently running; shared with the parent when sandboxed."""
+
+    def __init__(self):
+        self.value = -1
+
+def _page_worker(conn, tracker, page_fn, fn_args):
+    conn.send(('ready', None))
+    while True:
+        page_text = conn.recv()
+        if page_text is None:
+            break
+        try:
+            conn.send(('ok', page_fn(page_text, tracker, *fn_args)))
+        except Exception as e:
+            conn.send(('error', str(e)))
+
+def run_pages_with_budget(pages, page_fn, fn_args, labels, patterns, budget_ms):
+    """
+    Runs page_fn(page_text, tracker, *fn_args) for each (page_num, page_text) and
+    concatenates the returned lists. With a budget, pages run in a helper process
+    that is killed when one page takes longer than budget_ms; RegexBudgetExceeded
+    then carries the pattern that was running and the results of earlier pages.
+    """
+    results = []
+
+    if not budget_ms:
+        tracker = PatternTracker()
+        for _, page_text in pages:
+            results.extend(page_fn(page_text, tracker, *fn_args))
+        return results
+
+    import multiprocessing
+
+    ctx = multiprocessing.get_context()
+    parent_conn, child_conn = ctx.Pipe()
+    tracker = ctx.Value('i', -1, lock=False)
+    proc = ctx.Process(target=_page_worker, args=(child_conn, tracker, page_fn, fn_args), daemon=True)
+    proc.start()
+
+    try:
+        # Process start-up is not charged to the first page
+        parent_conn.recv()
+
+        for page_num, page_text in pages:
+            parent_conn.send(page_text)
+            if not parent_conn.poll(budget_ms / 1000):
+                index = tracker.value
+                raise RegexBudgetExceeded(
+                    labels[index] if 0 <= index < len(labels) else 'desconocido',
+                    patterns[index] if 0 <= index < len(patterns) else '',
+                    page_num, budget_ms, results
+                )
+            status, payload = parent_conn.recv()
+            if status == 'error':
+                raise Exception(payload)
+            results.extend(payload)
+
+        parent_conn.send(None)
+    finally:
+        if proc.is_alive():
+            proc.terminate()
+        proc.join()
+
+    return results
@@ -0,0 +1,28 @@
+import os
+import sys
+
+# Exit code the Node services map to PASSWORD_REQUIRED
+PASSWORD_EXIT_CODE = 10
+
+PASSWORD_KEYWORDS = ["password", "encrypted", "decrypt", "pdfsyntax", "pdfpassword"]
+
+def is_password_error(e):
+    """pdfplumber/pdfminer report wrong or missing passwords with varied (often empty) errors."""
+    error_msg = str(e).lower()
+    error_type = type(e).__name__.lower()
+    return (
+        any(keyword in error_msg for keyword in PASSWORD_KEYWORDS) or
+        any(keyword in error_type for keyword in PASSWORD_KEYWORDS) or
+        (error_msg.strip() == "" or error_msg.strip() == "none")
+    )
+
+def exit_password_required():
+    print("PASSWORD_REQUIRED", file=sys.stderr)
+    sys.exit(PASSWORD_EXIT_CODE)
+
+def write_output(path, content, encoding="utf-8"):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding=encoding) as f:
+        f.write(content)
@@ -1,15 +1,11 @@
 import json
 import re
 import sys
-import argparse
-import os
-import io
 import uuid
 from datetime import datetime
-
-# Force UTF-8 encoding for stdout on Windows
-if sys.platform == 'win32':
-    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+from text_cleanup import cleanup_patterns, compile_cleanup_rules, has_cleanup_rules, iter_clean_lines
+from compact_text import PAGE_MARKER
+from regex_guard import DEFAULT_PAGE_BUDGET_MS, RegexBudgetExceeded, check_pattern, run_pages_with_budget
 
 MONTH_MAP = {
     'ENE': 1, 'FEB': 2, 'MAR': 3, 'ABR': 4, 'MAY': 5, 'JUN': 6,
@@ -92,27 +88,34 @@ def parse_currency(value_str, dec='.', thou=','):
     except:
         return 0.0
 
-def process_with_template(text, template):
-    rules = template.get('rules', {})
-    regex = template.get('transaction_regex')
-    mapping = template.get('group_mapping', {})
-    dec_sep = template.get('decimal_separator', ',')
-    thou_sep = template.get('thousand_separator', '.')
-    date_format = template.get('date_format', 'DD/MM/YYYY')
-    year_hint = template.get('year_hint')
-    
-    if not regex or not mapping:
-        raise Exception("Template incompleto: falta regex o mapeo")
+def split_text_pages(text):
+    """
+    Splits text at the page markers into (page_num, page_text). The pieces
+    concatenate back to the original text, so anchors behave as before.
+    """
+    markers = list(PAGE_MARKER.finditer(text))
+    if not markers:
+        return [(1, text)]
+
+    # Anything before the first marker stays with the first page
+    bounds = [0] + [m.start() for m in markers[1:]] + [len(text)]
+    return [(int(m.group(1)), text[start:end]) for m, start, end in zip(markers, bounds, bounds[1:])]
 
+def _process_page(page_text, tracker, cleanup, base, pattern, mapping, pos_patterns, ignore_patterns,
+                  default_negative, dec_sep, thou_sep, date_format, year_hint):
+    """
+    Applies the template to one page. tracker.value holds the index of the pattern
+    being run: the cleanup patterns come first, then the transaction regex at `base`.
+    """
     transactions = []
-    pattern = re.compile(regex, re.MULTILINE)
-    
-    # Extra rules
-    default_negative = rules.get('default_negative', False)
-    pos_patterns = rules.get('positive_patterns', [])
-    ignore_patterns = rules.get('ignore_patterns', [])
 
-    matches = pattern.finditer(text)
+    # Template cleanup rules run first so header/footer noise never reaches the regex.
+    # This is the only place they are applied; extraction leaves the text untouched
+    if cleanup:
+        page_text = "\n".join(iter_clean_lines(page_text.split("\n"), cleanup, tracker))
+
+    tracker.value = base
+    matches = pattern.finditer(page_text)
     for match in matches:
         tx = {}
         try:
@@ -131,8 +134,9 @@ def process_with_template(text, template):
             
             # Apply sign logic
             is_positive = False
-            for p in pos_patterns:
-                if re.search(p, desc_raw, re.IGNORECASE):
+            for i, p in enumerate(pos_patterns):
+                tracker.value = base + 1 + i
+                if p.search(desc_raw):
                     is_positive = True
                     break
             
@@ -145,8 +149,9 @@ def process_with_template(text, template):
             
             # Apply ignore logic
             is_ignored = False
-            for p in ignore_patterns:
-                if re.search(p, desc_raw, re.IGNORECASE):
+            for i, p in enumerate(ignore_patterns):
+                tracker.value = base + 1 + len(pos_patterns) + i
+                if p.search(desc_raw):
                     is_ignored = True
                     break
             tx['ignored'] = is_ignored
@@ -154,9 +159,66 @@ def process_with_template(text, template):
             transactions.append(tx)
         except Exception as e:
             continue
+        finally:
+            tracker.value = base
 
     return transactions
 
+def process_with_template(text, template, page_budget_ms=None):
+    """
+    Extracts the transactions of a statement with a template. Patterns, including
+    the cleanup rules, go through the regex guard first, and each page (cleanup and
+    matching) must finish within page_budget_ms (template `rules.page_budget_ms`,
+    or the default; 0 disables the limit).
+    """
+    rules = template.get('rules', {})
+    regex = template.get('transaction_regex')
+    mapping = template.get('group_mapping', {})
+    dec_sep = template.get('decimal_separator', ',')
+    thou_sep = template.get('thousand_separator', '.')
+    date_format = template.get('date_format', 'DD/MM/YYYY')
+    year_hint = template.get('year_hint')
+    
+    if not regex or not mapping:
+        raise Exception("Template incompleto: falta regex o mapeo")
+
+    cleanup_rules = template.get('cleanup_rules')
+    cleanup = compile_cleanup_rules(cleanup_rules) if has_cleanup_rules(cleanup_rules) else None
+    cleanup_listed = cleanup_patterns(cleanup_rules) if cleanup else []
+
+    # Extra rules
+    default_negative = rules.get('default_negative', False)
+    pos_patterns = rules.get('positive_patterns', [])
+    ignore_patterns = rules.get('ignore_patterns', [])
+
+    # Tracker indices: cleanup patterns (already checked when compiled), then the
+    # transaction regex, positive and ignore patterns (see _process_page)
+    labels = ['transaction_regex']
+    labels += [f'rules.positive_patterns[{i}]' for i in range(len(pos_patterns))]
+    labels += [f'rules.ignore_patterns[{i}]' for i in range(len(ignore_patterns))]
+    patterns = [check_pattern(p, label) for p, label in zip([regex, *pos_patterns, *ignore_patterns], labels)]
+
+    pattern = re.compile(patterns[0], re.MULTILINE)
+    pos_compiled = [re.compile(p, re.IGNORECASE) for p in patterns[1:1 + len(pos_patterns)]]
+    ignore_compiled = [re.compile(p, re.IGNORECASE) for p in patterns[1 + len(pos_patterns):]]
+
+    base = len(cleanup_listed)
+    labels = [label for label, _ in cleanup_listed] + labels
+    patterns = [p for _, p in cleanup_listed] + patterns
+
+    if page_budget_ms is None:
+        page_budget_ms = rules.get('page_budget_ms', DEFAULT_PAGE_BUDGET_MS)
+
+    return run_pages_with_budget(
+        split_text_pages(text),
+        _process_page,
+        (cleanup, base, pattern, mapping, pos_compiled, ignore_compiled, default_negative,
+         dec_sep, thou_sep, date_format, year_hint),
+        labels,
+        patterns,
+        page_budget_ms,
+    )
+
 def calculate_summary(transactions, account_type='debit'):
     """Calculate totals from transactions"""
     total_abonos = 0.0
@@ -183,13 +245,24 @@ def calculate_summary(transactions, account_type='debit'):
         'total_cargos': round(total_cargos, 2)
     }
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description='Procesador Universal de Templates')
+def build_result(template, transactions):
+    account_type = template.get('account_type', 'debit')
+    return {
+        "meta_info": {
+            "banco": template.get('entity', 'Desconocido'),
+            "tipo_cuenta": account_type,
+            "resumen": calculate_summary(transactions, account_type)
+        },
+        "transacciones": transactions,
+        "template_config": template
+    }
+
+def add_arguments(parser):
     parser.add_argument('--text', type=str, required=True, help='Ruta al archivo de texto')
     parser.add_argument('--template', type=str, required=True, help='Ruta al archivo JSON del template')
-    
-    args = parser.parse_args()
-    
+    parser.add_argument('--page-budget-ms', type=int, help=f'Tiempo máximo por página en ms (0 = sin límite, por defecto {DEFAULT_PAGE_BUDGET_MS})')
+
+def run(args):
     try:
         with open(args.template, 'r', encoding='utf-8') as f:
             template = json.load(f)
@@ -197,22 +270,22 @@ if __name__ == "__main__":
         with open(args.text, 'r', encoding='utf-8') as f:
             raw_text = f.read()
             
-        transactions = process_with_template(raw_text, template)
-        account_type = template.get('account_type', 'debit')
-        summary = calculate_summary(transactions, account_type)
+        try:
+            transactions = process_with_template(raw_text, template, args.page_budget_ms)
+            result = build_result(template, transactions)
+        except RegexBudgetExceeded as e:
+            # Pages processed before the slow one are still returned
+            result = build_result(template, e.transactions)
+            result["error"] = str(e)
+            result["parcial"] = True
         
         # Output result as JSON to stdout
-        print(json.dumps({
-            "meta_info": {
-                "banco": template.get('entity', 'Desconocido'),
-                "tipo_cuenta": account_type,
-                "resumen": summary
-            },
-            "transacciones": transactions,
-            "template_config": template
-        }, indent=2, ensure_ascii=False))
+        print(json.dumps(result, indent=2, ensure_ascii=False))
         
     except Exception as e:
         print(json.dumps({"error": str(e)}))
         sys.exit(1)
 
+if __name__ == "__main__":
+    from cli import main
+    main(['process-template', *sys.argv[1:]])
@@ -0,0 +1,189 @@
+import json
+import re
+import sys
+import os
+from regex_guard import PatternTracker, check_pattern
+
+# Page markers drive the page split downstream, so cleanup never removes them
+PAGE_MARKER = re.compile(r'^---\s*PÁGINA\s*\d+\s*---\s*$', re.IGNORECASE)
+
+def cleanup_patterns(rules):
+    """Lists (label, pattern) for every regex in the rules; the position is the pattern's index in a tracker."""
+    rules = rules or {}
+    patterns = [(f'cleanup_rules.drop_patterns[{i}]', p) for i, p in enumerate(rules.get('drop_patterns', []))]
+    for i, block in enumerate(rules.get('strip_blocks', [])):
+        patterns.append((f'cleanup_rules.strip_blocks[{i}].start', block['start']))
+        patterns.append((f'cleanup_rules.strip_blocks[{i}].end', block['end']))
+    return patterns
+
+def compile_cleanup_rules(rules):
+    """
+    Compiles declarative cleanup rules, as stored in a template's `cleanup_rules`:
+      - drop_patterns: regexes; lines matching any of them are removed
+      - strip_blocks: [{"start": regex, "end": regex}]; removes from the start line through the end line
+      - collapse_whitespace: strips trailing whitespace and collapses runs of blank lines
+    Patterns are case-insensitive and go through the regex guard (see regex_guard.check_pattern).
+    Each compiled pattern keeps its index in cleanup_patterns().
+    """
+    rules = rules or {}
+    compiled = [re.compile(check_pattern(p, label), re.IGNORECASE) for label, p in cleanup_patterns(rules)]
+    n_drop = len(rules.get('drop_patterns', []))
+    return {
+        'drop': list(enumerate(compiled[:n_drop])),
+        'blocks': [(i, compiled[i], compiled[i + 1]) for i in range(n_drop, len(compiled), 2)],
+        'collapse_whitespace': bool(rules.get('collapse_whitespace', False)),
+    }
+
+def _match_block(blocks, line, tracker):
+    """
+    Returns (started, end) for the first block whose start matches the line. end is
+    the (index, pattern) still to be found, or None when the end also matches after
+    the start on the same line (a single-line block).
+    """
+    for index, start, end in blocks:
+        tracker.value = index
+        match = start.search(line)
+        if match:
+            tracker.value = index + 1
+            return True, (None if end.search(line, match.end()) else (index + 1, end))
+    return False, None
+
+def _matches_any(patterns, line, tracker):
+    for index, pattern in patterns:
+        tracker.value = index
+        if pattern.search(line):
+            return True
+    return False
+
+def iter_clean_lines(lines, compiled, tracker=None):
+    """
+    Applies compiled rules to an iterable of lines (without newlines) in a single pass.
+    Lines inside a block are held back until its end matches; a block still open at
+    the next page marker (or the end of the text) was a false start, so its lines are
+    kept and rescanned from the line after the start.
+    tracker.value is set to the index of each pattern before it runs.
+    """
+    drop = compiled['drop']
+    blocks = compiled['blocks']
+    collapse = compiled['collapse_whitespace']
+    if tracker is None:
+        tracker = PatternTracker()
+
+    source = ((line, True) for line in lines)
+    replay = []  # (line, may_start_block) to rescan, in reverse order
+    block_end = None
+    buffered = []
+    previous_blank = False
+
+    while True:
+        if replay:
+            line, may_start_block = replay.pop()
+        else:
+            line, may_start_block = next(source, (None, True))
+
+        if block_end is not None and (line is None or PAGE_MARKER.match(line)):
+            # A block never spans pages: release what it held
+            reopened = [(buffered[0], False)] + [(held, True) for held in buffered[1:]]
+            replay = ([(line, True)] if line is not None else []) + reopened[::-1]
+            block_end = None
+            buffered = []
+            continue
+
+        if line is None:
+            break
+
+        if PAGE_MARKER.match(line):
+            previous_blank = False
+            yield line
+            continue
+
+        if block_end is not None:
+            buffered.append(line)
+            tracker.value = block_end[0]
+            if block_end[1].search(line):
+                block_end = None
+                buffered = []
+            continue
+
+        if may_start_block:
+            started, block_end = _match_block(blocks, line, tracker)
+            if started:
+                if block_end is not None:
+                    buffered = [line]
+                continue
+
+        if _matches_any(drop, line, tracker):
+            continue
+
+        if collapse:
+            line = line.rstrip()
+            if not line:
+                if previous_blank:
+                    continue
+                previous_blank = True
+            else:
+                previous_blank = False
+
+        yield line
+
+def has_cleanup_rules(rules):
+    return bool(rules) and any(rules.get(key) for key in ('drop_patterns', 'strip_blocks', 'collapse_whitespace'))
+
+def clean_text(text, rules):
+    """Applies cleanup rules to an in-memory text. Returns the text untouched if there are no rules."""
+    if not has_cleanup_rules(rules):
+        return text
+    return "\n".join(iter_clean_lines(text.split("\n"), compile_cleanup_rules(rules)))
+
+def clean_file(input_path, output_path, rules):
+    """Streams input_path through the rules into output_path. Both may be the same file."""
+    compiled = compile_cleanup_rules(rules)
+    tmp_path = output_path + ".tmp"
+
+    with open(input_path, 'r', encoding='utf-8') as src, open(tmp_path, 'w', encoding='utf-8') as dst:
+        lines = (line.rstrip('\n') for line in src)
+        for line in iter_clean_lines(lines, compiled):
+            dst.write(line + "\n")
+
+    os.replace(tmp_path, output_path)
+
+def load_rules(rules_arg=None, template_path=None):
+    if rules_arg:
+        if os.path.exists(rules_arg):
+            with open(rules_arg, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return json.loads(rules_arg)
+    if template_path:
+        with open(template_path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('cleanup_rules', {})
+    return {}
+
+def add_arguments(parser):
+    parser.add_argument('--input', type=str, required=True, help='Ruta al archivo TXT de entrada')
+    parser.add_argument('--output', type=str, help='Ruta al archivo TXT de salida (por defecto sobrescribe la entrada)')
+    parser.add_argument('--rules', type=str, help='Reglas de limpieza (JSON o ruta a archivo JSON)')
+    parser.add_argument('--template', type=str, help='Template JSON del que leer cleanup_rules')
+    parser.add_argument('--save-to-template', action='store_true', help='Guarda --rules en cleanup_rules del template')
+
+def run(args):
+    try:
+        rules = load_rules(args.rules, None if args.rules else args.template)
+
+        if args.save_to_template and args.template and args.rules:
+            with open(args.template, 'r', encoding='utf-8') as f:
+                template = json.load(f)
+            template['cleanup_rules'] = rules
+            with open(args.template, 'w', encoding='utf-8') as f:
+                json.dump(template, f, indent=2, ensure_ascii=False)
+
+        output_path = args.output or args.input
+        clean_file(args.input, output_path, rules)
+        print(f"Éxito: Texto limpio en {output_path}")
+
+    except Exception as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    from cli import main
+    main(['clean-text', *sys.argv[1:]])
@@ -122,7 +122,7 @@ export function UploadForm({ isOpen, onClose, onUploadSuccess, existingBanks }:
 
           setExtractedText(extractData.text);
 
-          await performAiNormalization(extractData.text, values.bank || "", values.accountType || "", newSessionId, uploadResult.path, values.extractName, controller.signal);
+          await performAiNormalization(extractData.text, values.bank || "", values.accountType || "", newSessionId, uploadResult.path, values.extractName, controller.signal, extractData.chunks);
         } finally {
           setIsAiProcessing(false);
         }
@@ -160,7 +160,7 @@ export function UploadForm({ isOpen, onClose, onUploadSuccess, existingBanks }:
     }
   };
 
-  const performAiNormalization = async (text: string, bank: string, accountType: string, sId?: string, fPath?: string, oName?: string, signal?: AbortSignal) => {
+  const performAiNormalization = async (text: string, bank: string, accountType: string, sId?: string, fPath?: string, oName?: string, signal?: AbortSignal, chunks?: { pages: number[]; text: string }[]) => {
     setIsAiProcessing(true);
     setPageProgress(null);
 
@@ -170,6 +170,7 @@ export function UploadForm({ isOpen, onClose, onUploadSuccess, existingBanks }:
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({
           text,
+          chunks,
           bank,
           accountType,
           sessionId: sId,